@@ -18,9 +18,8 @@
 
 import os
 import re
-import sys
 
-from ctypes import *
+from ctypes import POINTER, byref, c_int, c_void_p, cast, pointer
 try:
     from collections import UserList
 except ImportError:
@@ -28,7 +27,20 @@ except ImportError:
 
 from collections import namedtuple
 
-from .xkb import *
+from .xkb import (
+    Atom, BadAlloc, BadImplementation, BadLength, BadMatch, None_, STRING, Success,
+    XCloseDisplay, XConnectionNumber, XEvent, XFlush, XFree, XGetAtomNames,
+    XNextEvent, XPending,
+    XkbAllControlsMask, XkbEvent, XkbFreeClientMap, XkbFreeControls, XkbFreeNames,
+    XkbGetControls, XkbGetMap, XkbGetNames, XkbGetState, XkbGroupNamesMask,
+    XkbGroupStateMask, XkbIgnoreExtension, XkbLockGroup, XkbMajorVersion,
+    XkbMapNotify, XkbMapNotifyMask, XkbMinorVersion, XkbNamesNotify,
+    XkbNamesNotifyMask, XkbNewKeyboardNotify, XkbNewKeyboardNotifyMask,
+    XkbNumKbdGroups, XkbOD_BadLibraryVersion, XkbOD_BadServerVersion,
+    XkbOD_ConnectionRefused, XkbOD_NonXkbServer, XkbOpenDisplay,
+    XkbQueryExtension, XkbSelectEventDetails, XkbSelectEvents, XkbStateNotify,
+    XkbStateRec, XkbSymbolsNameMask, XkbUseCoreKbd,
+)
 
 
 # Error-related utilities
@@ -71,6 +83,9 @@ def _ensure_type(obj, type):
 class GroupData(namedtuple("GroupData", ["num", "name", "symbol", "variant"])):
     """Contains all data about the specific group."""
 
+    # Don't create a per-instance __dict__, like the namedtuple base doesn't
+    __slots__ = ()
+
     def __format__(self, format_spec):
         """If format_spec is not empty, use it as a format string in
         format_spec.format(...) with keyword arguments named corresponding to
@@ -124,24 +139,47 @@ class XKeyboard(object):
       ''
       >>> xkb.group_num
       0
+      >>> xkb.rotate_group(-1)
+      >>> xkb.group_num
+      3
       >>>
     """
 
     # Fields with default values
 
-    non_symbols = {"capslock", "pc", "inet", "group", "terminate", "compose", "keypad"}
+    non_symbols = frozenset({"capslock", "pc", "inet", "group", "terminate",
+                             "compose", "keypad"})
 
 
     # Main methods
 
-    def __init__(self, auto_open=True, non_symbols=None):
+    def __init__(self, auto_open=True, non_symbols=None, track_events=False):
         """
         :param auto_open: if True automatically call open_display().
         :param non_symbols: either iterable of string non-symbol names or
                             None to use the default set of non-symbol names.
+        :param track_events: if True listen to XKB events and keep the current
+                             group number, names and symbols up to date on
+                             poll_events() calls instead of querying X server.
+                             After changing the group through this object,
+                             group_num queries X server until poll_events()
+                             processes the resulting event.
         """
+        self._display = None
+        self._keyboard_description = None
+        self._track_events = track_events
+        self._atom_names = {}
+        self._clear_caches()
+
+        # Reused by every group_num read, so an XKeyboard object must not be
+        # shared between threads without locking (as with Xlib calls anyway)
+        self._xkb_state = XkbStateRec()
+        self._xkb_state_ref = byref(self._xkb_state)
+        self._xkb_event = XkbEvent()
+        self._xkb_event_ptr = cast(pointer(self._xkb_event), POINTER(XEvent))
+
         if non_symbols:
-            self.non_symbols = non_symbols
+            self.non_symbols = frozenset(non_symbols)
 
         if auto_open:
             self.open_display()
@@ -150,7 +188,8 @@ class XKeyboard(object):
         """Establishes connection with X server and prepares objects
         necessary to retrieve and send data.
         """
-        self.close_display()    # Properly finish previous open_display()
+        if self._display is not None:
+            self.close_display()    # Properly finish previous open_display()
 
         XkbIgnoreExtension(False)
 
@@ -159,10 +198,10 @@ class XKeyboard(object):
         minor = c_int(XkbMinorVersion)
         reason = c_int()
 
-        self._display = XkbOpenDisplay(
+        display = XkbOpenDisplay(
             display_name,
             None, None, byref(major), byref(minor), byref(reason))
-        if not self._display:
+        if not display:
             if reason.value in OPEN_DISPLAY_ERRORS:
                 # Assume POSIX conformance
                 display_name = os.getenv("DISPLAY") or "default"
@@ -177,11 +216,13 @@ class XKeyboard(object):
                         + ".")
             else:
                 raise X11Error("Unknown error {} from XkbOpenDisplay.".format(reason.value))
+        self._display = display
 
-        self._keyboard_description = XkbGetMap(self._display, 0, XkbUseCoreKbd)
-        if not self._keyboard_description:
+        keyboard_description = XkbGetMap(self._display, 0, XkbUseCoreKbd)
+        if not keyboard_description:
             self.close_display()
             raise X11Error("Failed to get keyboard description.")
+        self._keyboard_description = keyboard_description
 
         # Controls mask doesn't affect the availability of xkb->ctrls->num_groups anyway
         # Just use a valid value, and xkb->ctrls->num_groups will be definitely set
@@ -196,20 +237,103 @@ class XKeyboard(object):
             self.close_display()
             raise X11Error(GET_NAMES_ERRORS[status] + ".")
 
+        try:
+            self._update_caches()
+            if self._track_events:
+                self._select_events()
+        except BaseException:
+            self.close_display()
+            raise
+
+    def refresh(self):
+        """Re-reads names and symbols of all groups from X server.
+
+        These are cached at open_display() time, so call this method if the
+        keyboard configuration might have changed since then.
+        """
+        display = self._get_display()
+
+        status = XkbGetControls(display, XkbAllControlsMask, self._keyboard_description)
+        if status != Success:
+            raise X11Error(GET_CONTROLS_ERRORS[status] + ".")
+
+        names_mask = XkbSymbolsNameMask | XkbGroupNamesMask
+        status = XkbGetNames(display, names_mask, self._keyboard_description)
+        if status != Success:
+            raise X11Error(GET_NAMES_ERRORS[status] + ".")
+
+        self._update_caches()
+        if self._track_events:
+            self._group_num = self._get_state_group_num()
+
+    def poll_events(self):
+        """Processes all pending XKB events without blocking. Only available
+        if XKeyboard was created with track_events=True.
+
+        Call this method before every wait for display_fd to become readable
+        (e.g. with select.select()): other calls on this object may make Xlib
+        read events from the connection into its own queue, and these don't
+        make display_fd readable again.
+
+        :returns: True if the current group or the keyboard configuration
+                  has changed since the previous call
+        :rtype: bool
+        """
+        if not self._track_events:
+            raise RuntimeError("XKB events are not tracked.")
+
+        changed = False
+        xkb_event = self._xkb_event
+        display = self._get_display()
+        # refresh() waits for replies from X server, so events arriving meanwhile
+        # (e.g. XkbStateNotify sent by setxkbmap along with XkbMapNotify) are
+        # queued by Xlib; keep going until the queue is empty
+        while XPending(display):
+            config_changed = False
+            while XPending(display):
+                XNextEvent(display, self._xkb_event_ptr)
+                if xkb_event.type != self._xkb_event_type:
+                    continue
+
+                xkb_type = xkb_event.any.xkb_type
+                if xkb_type == XkbStateNotify:
+                    if xkb_event.state.group != self._group_num:
+                        self._group_num = xkb_event.state.group
+                        changed = True
+                elif xkb_type in (XkbMapNotify, XkbNamesNotify, XkbNewKeyboardNotify):
+                    config_changed = True
+
+            if config_changed:
+                self.refresh()
+                changed = True
+
+        return changed
+
+    @property
+    def display_fd(self):
+        """File descriptor of the connection with X server (get-only).
+
+        :getter: Returns the connection file descriptor
+        :type: int
+        """
+        return XConnectionNumber(self._get_display())
+
     def close_display(self):
         """Closes connection with X server and cleans up objects
         created on open_display().
         """
-        if hasattr(self, "_keyboard_description") and self._keyboard_description:
+        if self._keyboard_description is not None:
             names_mask = XkbSymbolsNameMask | XkbGroupNamesMask
             XkbFreeNames(self._keyboard_description, names_mask, True)
             XkbFreeControls(self._keyboard_description, XkbAllControlsMask, True)
             XkbFreeClientMap(self._keyboard_description, 0, True)
-            del self._keyboard_description
+            self._keyboard_description = None
+            self._clear_caches()
 
-        if hasattr(self, "_display") and self._display:
+        if self._display is not None:
             XCloseDisplay(self._display)
-            del self._display
+            self._display = None
+            self._atom_names.clear()
 
     def __del__(self):
         self.close_display()
@@ -231,12 +355,15 @@ class XKeyboard(object):
         :getter: Returns all data about all groups
         :type: list of GroupData
         """
-        return _ListProxy(GroupData(num, name, symbol, variant)
-                          for (num, name, symbol, variant)
-                          in zip(range(self.groups_count),
-                                 self.groups_names,
-                                 self.groups_symbols,
-                                 self.groups_variants))
+        self._get_display()     # Don't report stale data of a closed display
+        if self._cached_symboldata is None:
+            raise X11Error("Failed to get symbol names.")
+        num_to_symbol = self._cached_num_to_symbol
+        num_to_variant = self._cached_num_to_variant
+        return _ListProxy(GroupData(num, self._get_group_name_by_num(num),
+                                    num_to_symbol.get(num, ""),
+                                    num_to_variant.get(num, ""))
+                          for num in range(self._groups_count))
 
     @property
     def groups_count(self):
@@ -245,17 +372,8 @@ class XKeyboard(object):
         :getter: Returns number of all groups
         :type: int
         """
-        if self._keyboard_description.contents.ctrls is not None:
-            return self._keyboard_description.contents.ctrls.contents.num_groups
-        else:
-            groups_source = self._groups_source
-
-            groups_count = 0
-            while (groups_count < XkbNumKbdGroups and
-                   groups_source[groups_count] != None_):
-                groups_count += 1
-
-            return groups_count
+        self._get_display()     # Don't report stale data of a closed display
+        return self._groups_count
 
     @property
     def groups_names(self):
@@ -307,18 +425,50 @@ class XKeyboard(object):
         :setter: Sets current group number
         :type: int
         """
-        xkb_state = XkbStateRec()
-        XkbGetState(self._display, XkbUseCoreKbd, byref(xkb_state))
-        return xkb_state.group
+        if self._track_events and self._group_num is not None:
+            self._get_display()     # Don't report stale data of a closed display
+            return self._group_num
+        return self._get_state_group_num()
 
     @group_num.setter
     def group_num(self, value):
-        _ensure_type(value, int)
-        if XkbLockGroup(self._display, XkbUseCoreKbd, value):
-            XFlush(self._display)
-        else:
+        self.lock_group(value)
+
+    def lock_group(self, group_num, flush=True):
+        """Sets current group number. Several changes can be sent to X server
+        at once by passing flush=False and calling flush() afterwards.
+
+        :param group_num: new group number
+        :param flush: if True, send the request to X server immediately
+        """
+        _ensure_type(group_num, int)
+        display = self._get_display()
+        if not XkbLockGroup(display, XkbUseCoreKbd, group_num):
             self.close_display()
             raise X11Error("Failed to set group number.")
+        if flush:
+            XFlush(display)
+
+        # The resulting group depends on the server's GroupsWrap setting, so
+        # don't guess it; poll_events() will store it from XkbStateNotify
+        if self._track_events:
+            self._group_num = None
+
+    def rotate_group(self, delta):
+        """Switches current group by delta positions, wrapping around
+        the number of groups.
+
+        :param delta: number of positions to switch by, may be negative
+        """
+        _ensure_type(delta, int)
+        self._get_display()     # Don't use caches of a closed display
+        if not self._groups_count:
+            raise X11Error("No groups to switch between.")
+        self.lock_group((self._get_state_group_num() + delta) % self._groups_count)
+
+    def flush(self):
+        """Sends all requests made by lock_group(..., flush=False) to X server."""
+        XFlush(self._get_display())
 
 
     @property
@@ -334,10 +484,9 @@ class XKeyboard(object):
     @group_name.setter
     def group_name(self, value):
         _ensure_type(value, str)
-        groups_names = self.groups_names
-        n_mapping = {groups_names[i]: i for i in range(len(groups_names))}
+        self._get_display()     # Don't look up in caches of a closed display
         try:
-            self.group_num = n_mapping[value]
+            self.group_num = self._cached_name_to_num[value]
         except KeyError as exc:
             raise ValueError("Wrong group name {!r}.".format(value))
 
@@ -350,15 +499,14 @@ class XKeyboard(object):
         :setter: Sets current group symbol
         :type: str
         """
-        s_mapping = {symdata.index: symdata.symbol for symdata in self._symboldata_list}
-        return s_mapping[self.group_num]
+        return self._cached_num_to_symbol[self.group_num]
 
     @group_symbol.setter
     def group_symbol(self, value):
         _ensure_type(value, str)
-        s_mapping = {symdata.symbol: symdata.index for symdata in self._symboldata_list}
+        self._get_display()     # Don't look up in caches of a closed display
         try:
-            self.group_num = s_mapping[value]
+            self.group_num = self._cached_symbol_to_num[value]
         except KeyError as exc:
             raise ValueError("Wrong group symbol {!r}.".format(value))
 
@@ -370,8 +518,7 @@ class XKeyboard(object):
         :getter: Returns current group variant
         :type: str
         """
-        v_mapping = {symdata.index: symdata.variant for symdata in self._symboldata_list}
-        return v_mapping[self.group_num] or ""
+        return self._cached_num_to_variant[self.group_num]
 
     # Current group variant is a get-only value because variants are associated
     # with symbols in /usr/share/X11/xkb/rules/evdev.lst and specified at
@@ -427,83 +574,199 @@ class XKeyboard(object):
 
     # Private properties and methods
 
-    @property
-    def _groups_source(self):
-        return self._keyboard_description.contents.names.contents.groups
-
-    @property
-    def _symbols_source(self):
-        return self._keyboard_description.contents.names.contents.symbols
-
     @property
     def _symboldata_list(self):
-        symbol_str_atom = self._symbols_source
-        if symbol_str_atom != None_:
-            b_symbol_str = XGetAtomName(self._display, symbol_str_atom)
-            return _parse_symbols(b_symbol_str.decode(), self.non_symbols)
-        else:
+        self._get_display()     # Don't report stale data of a closed display
+        if self._cached_symboldata is None:
             raise X11Error("Failed to get symbol names.")
+        return self._cached_symboldata
 
     def _get_group_name_by_num(self, group_num):
-        cur_group_atom = self._groups_source[group_num]
-        if cur_group_atom != None_:
-            b_group_name = XGetAtomName(self._display, cur_group_atom)
-            return b_group_name.decode() if b_group_name else ""
-        else:
+        self._get_display()     # Don't report stale data of a closed display
+        group_name = self._cached_group_names[group_num]
+        if group_name is None:
             raise X11Error("Failed to get group name.")
+        return group_name
+
+    def _clear_caches(self):
+        self._groups_count = None
+        self._cached_group_names = None
+        self._cached_name_to_num = None
+        self._cached_symboldata = None
+        self._cached_symbol_to_num = None
+        self._cached_num_to_symbol = None
+        self._cached_num_to_variant = None
+        self._group_num = None
+
+    # Every atom name lookup is a round-trip to X server, so resolve all atoms
+    # once here instead of on every property access
+    def _update_caches(self):
+        # Everything is computed into locals first, so that an error (e.g. on
+        # refresh()) leaves the previous caches intact and consistent
+
+        # Each .contents access creates a new ctypes object, so do it only once
+        keyboard_description = self._keyboard_description.contents
+        names = keyboard_description.names.contents
+        groups_source = names.groups
+        symbol_str_atom = names.symbols
+
+        if keyboard_description.ctrls:
+            groups_count = keyboard_description.ctrls.contents.num_groups
+        else:
+            groups_count = 0
+            while (groups_count < XkbNumKbdGroups and
+                   groups_source[groups_count] != None_):
+                groups_count += 1
+
+        group_atoms = [groups_source[i] for i in range(groups_count)]
+
+        # Missing names are reported only when the data depending on them is
+        # read, so that the rest of the keyboard stays usable
+        named_atoms = [atom for atom in [symbol_str_atom] + group_atoms if atom != None_]
+        atom_names = dict(zip(named_atoms, self._get_atom_names(named_atoms)))
+
+        group_names = [atom_names.get(atom) for atom in group_atoms]
+        name_to_num = {name: num for num, name in enumerate(group_names)
+                       if name is not None}
+
+        if symbol_str_atom != None_:
+            symboldata_list = _parse_symbols(atom_names[symbol_str_atom],
+                                             self.non_symbols)
+            symbol_to_num = {symdata.symbol: symdata.index
+                             for symdata in symboldata_list}
+            num_to_symbol = {symdata.index: symdata.symbol
+                             for symdata in symboldata_list}
+            num_to_variant = {symdata.index: symdata.variant or ""
+                              for symdata in symboldata_list}
+        else:
+            message = "Failed to get symbol names."
+            symboldata_list = None
+            symbol_to_num = _MissingAtomDict(message)
+            num_to_symbol = _MissingAtomDict(message)
+            num_to_variant = _MissingAtomDict(message)
+
+        self._groups_count = groups_count
+        self._cached_group_names = group_names
+        self._cached_name_to_num = name_to_num
+        self._cached_symboldata = symboldata_list
+        self._cached_symbol_to_num = symbol_to_num
+        self._cached_num_to_symbol = num_to_symbol
+        self._cached_num_to_variant = num_to_variant
+
+    # Xlib functions crash on a NULL display instead of reporting an error
+    def _get_display(self):
+        if self._display is None:
+            raise X11Error("Display is not open.")
+        return self._display
+
+    def _get_state_group_num(self):
+        XkbGetState(self._get_display(), XkbUseCoreKbd, self._xkb_state_ref)
+        return self._xkb_state.group
+
+    def _select_events(self):
+        opcode = c_int()
+        event_base = c_int()
+        error_base = c_int()
+        major = c_int(XkbMajorVersion)
+        minor = c_int(XkbMinorVersion)
+        if not XkbQueryExtension(self._display, byref(opcode), byref(event_base),
+                                 byref(error_base), byref(major), byref(minor)):
+            raise X11Error("Failed to query XKB extension.")
+        # All XKB events share the same core event type
+        self._xkb_event_type = event_base.value
+
+        events_mask = XkbMapNotifyMask | XkbNamesNotifyMask | XkbNewKeyboardNotifyMask
+        if not XkbSelectEvents(self._display, XkbUseCoreKbd, events_mask, events_mask):
+            raise X11Error("Failed to select XKB events.")
+
+        # Modifier changes generate XkbStateNotify events too, listen only to
+        # group changes
+        if not XkbSelectEventDetails(self._display, XkbUseCoreKbd, XkbStateNotify,
+                                     XkbGroupStateMask, XkbGroupStateMask):
+            raise X11Error("Failed to select XKB events.")
+
+        self._group_num = self._get_state_group_num()
+
+    def _get_atom_names(self, atoms):
+        # An atom keeps its name until X server resets, so only atoms not seen
+        # on this connection yet have to be requested (e.g. on refresh())
+        atom_names = self._atom_names
+        new_atoms = list({atom for atom in atoms if atom not in atom_names})
+        if new_atoms:
+            atom_names.update(zip(new_atoms, self._request_atom_names(new_atoms)))
+        return [atom_names[atom] for atom in atoms]
+
+    def _request_atom_names(self, atoms):
+        # Unlike XGetAtomName(), XGetAtomNames() sends all requests before
+        # waiting for replies, so it takes one round-trip for any number of atoms
+        count = len(atoms)
+        b_names = (STRING * count)()
+        status = XGetAtomNames(self._get_display(), (Atom * count)(*atoms), count,
+                               b_names)
+        try:
+            if not status:
+                raise X11Error("Failed to get atom names.")
+            return [b_name.decode() if b_name else "" for b_name in b_names]
+        finally:
+            for name_ptr in cast(b_names, POINTER(c_void_p * count)).contents:
+                if name_ptr:
+                    XFree(name_ptr)
 
 
 SymbolData = namedtuple("SymbolData", ["symbol", "variant", "index"])
-SYMBOL_REGEX = re.compile(r"""
-    (?P<symbol>\w+)
-    (?: \( (?P<variant>\w+.*) \) )?
-    (?: : (?P<index>\d+) )?
-    """, re.VERBOSE)
-
-class _Compat_SRE_Pattern:
-    def __init__(self, re_obj):
-        self.re_obj = re_obj
-
-    def __getattr__(self, name):
-        return getattr(self.re_obj, name)
-
-    # re_obj.fullmatch is a Python 3.4+ only feature
-    def fullmatch(self, string, pos=None, endpos=None):
-        pos = pos if pos else 0
-        endpos = endpos if endpos else len(string)
-        match = self.re_obj.match(string, pos, endpos)
-        if match and match.span() != (pos, endpos):
-            return None
-        return match
-
-if sys.version_info < (3, 4):
-    SYMBOL_REGEX = _Compat_SRE_Pattern(SYMBOL_REGEX)
 
+# Symbols string has the form "pc+us+ru:2+ua(winkeys):3+inet(evdev)", i.e.
+# "+"-separated items of "symbol[(variant)][:index]", so plain string scanning
+# is enough to parse it
 def _parse_symbols(symbols_str, non_symbols, default_index=0):
     def get_symboldata(symstr):
-        match = SYMBOL_REGEX.fullmatch(symstr)
-        if match:
-            index = match.group('index')
-            return SymbolData(
-                match.group('symbol'),
-                match.group('variant'),
-                int(index) - 1 if index else default_index)
+        symbol = symstr
+        variant = None
+        index = default_index
+
+        colon = symbol.rfind(':')
+        if colon != -1 and symbol[colon + 1:].isdecimal():
+            index = int(symbol[colon + 1:]) - 1
+            symbol = symbol[:colon]
+
+        paren = symbol.find('(')
+        if paren != -1 and symbol.endswith(')'):
+            variant = symbol[paren + 1:-1]
+            symbol = symbol[:paren]
+
+        # Same checks as for r"\w+(\(\w.*\))?", without involving the regex engine
+        if (symbol and ("_" + symbol).isidentifier() and
+                (variant is None or variant and ("_" + variant[0]).isidentifier())):
+            return SymbolData(symbol, variant, index)
         else:
             raise X11Error("Malformed symbol string: {!r}.".format(symstr))
 
     symboldata_list = []
+    indices = set()
     for symstr in symbols_str.split('+'):
         symboldata = get_symboldata(symstr)
         if symboldata.symbol not in non_symbols:
+            if symboldata.index in indices:
+                raise X11Error("Duplicate index in symbol string: {!r}.".format(
+                    symbols_str))
+            indices.add(symboldata.index)
             symboldata_list.append(symboldata)
 
-    indices = [symdata.index for symdata in symboldata_list]
-    assert len(indices) == len(set(indices)), ("Duplicate index in %r" %
-                                               symboldata_list)
-
     return symboldata_list
 
 
+class _MissingAtomDict(dict):
+    """Empty mapping standing in for data derived from an atom without a name.
+    Looking up any key raises X11Error, as reading that atom would."""
+
+    def __init__(self, message):
+        super().__init__()
+        self.message = message
+
+    def __missing__(self, key):
+        raise X11Error(self.message)
+
+
 _COLON_SEPARATOR_REGEX = re.compile(r"(?<!\\):")
 
 class _ListProxy(UserList):
@@ -533,11 +796,12 @@ __all__ = ["XKeyboard", "GroupData", "X11Error"]
 
 
 def print_xkeyboard(xkb):
+    groups_data = xkb.groups_data
     print("xkb {")
     contents = [
-        "%d groups {%s}," % (xkb.groups_count, ", ".join(xkb.groups_names)),
-        "symbols {%s}" % ", ".join(xkb.groups_symbols),
-        "variants {%s}" % ", ".join('"{}"'.format(variant) for variant in xkb.groups_variants),
+        "%d groups {%s}," % (len(groups_data), ", ".join(data.name for data in groups_data)),
+        "symbols {%s}" % ", ".join(data.symbol for data in groups_data),
+        "variants {%s}" % ", ".join('"{}"'.format(data.variant) for data in groups_data),
         "current group: %s (%d) - %s - \"%s\"" %
             (xkb.group_symbol, xkb.group_num, xkb.group_name, xkb.group_variant)
     ]
@@ -547,11 +811,15 @@ def print_xkeyboard(xkb):
 def test():
     with XKeyboard() as xkb:
         print_xkeyboard(xkb)
-        xkb.group_num += 2
+        xkb.rotate_group(2)
+        print_xkeyboard(xkb)
+        xkb.rotate_group(-3)
         print_xkeyboard(xkb)
-        xkb.group_num -= 3
+        xkb.rotate_group(-2)
         print_xkeyboard(xkb)
-        xkb.group_num -= 2
+        xkb.lock_group(1, flush=False)
+        xkb.lock_group(0, flush=False)
+        xkb.flush()
         print_xkeyboard(xkb)
 
 if __name__ == '__main__':